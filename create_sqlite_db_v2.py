@@ -1,11 +1,87 @@
 import sqlite3
 import json
+import logging
+import threading
 from datetime import datetime
 
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:  # 未安装 orjson 时回退到标准库 json
+    _loads = json.loads
+
+
+log = logging.getLogger(__name__)
+
+# 查询函数在每个线程内复用同一个连接，保留连接上的页缓存和语句缓存
+_LOCAL = threading.local()
+
+# 每导入多少行输出一次进度日志
+LOG_EVERY = 1000
+
+# 交互式显示所有基金时每页的条数
+PAGE_SIZE = 100
+
+# 以百分比形式显示的列
+_PCT_COLS = frozenset({
+    '日增长率', '近1周收益率', '近1月收益率',
+    '近3月收益率', '近6月收益率', '近1年收益率',
+    '近2年收益率', '近3年收益率', '今年来收益率',
+    '成立来收益率', '自定义3', '手续费', '自定义5',
+})
+
+# 已存在的基金代码原地更新（UPDATE 会触发全文索引同步触发器，ID 保持不变），
+# 不使用 INSERT OR REPLACE：REPLACE 删除旧行时不触发删除触发器，全文索引会残留旧条目
+_INSERT_SQL = '''
+INSERT INTO 基金数据 (
+    基金代码, 基金简称, 基金简拼, 更新日期, 单位净值,
+    累计净值, 日增长率, 近1周收益率, 近1月收益率,
+    近3月收益率, 近6月收益率, 近1年收益率, 近2年收益率,
+    近3年收益率, 今年来收益率, 成立来收益率, 发行日期,
+    是否可购, 自定义2, 自定义3, 手续费, 折扣,
+    自定义5, 自定义6
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(基金代码) DO UPDATE SET
+    基金简称 = excluded.基金简称, 基金简拼 = excluded.基金简拼,
+    更新日期 = excluded.更新日期, 单位净值 = excluded.单位净值,
+    累计净值 = excluded.累计净值, 日增长率 = excluded.日增长率,
+    近1周收益率 = excluded.近1周收益率, 近1月收益率 = excluded.近1月收益率,
+    近3月收益率 = excluded.近3月收益率, 近6月收益率 = excluded.近6月收益率,
+    近1年收益率 = excluded.近1年收益率, 近2年收益率 = excluded.近2年收益率,
+    近3年收益率 = excluded.近3年收益率, 今年来收益率 = excluded.今年来收益率,
+    成立来收益率 = excluded.成立来收益率, 发行日期 = excluded.发行日期,
+    是否可购 = excluded.是否可购, 自定义2 = excluded.自定义2,
+    自定义3 = excluded.自定义3, 手续费 = excluded.手续费,
+    折扣 = excluded.折扣, 自定义5 = excluded.自定义5,
+    自定义6 = excluded.自定义6
+'''
+
+
+def _configure(conn):
+    """为新打开的连接设置 WAL 日志及缓存相关的 PRAGMA"""
+    conn.executescript('''
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-64000;
+    PRAGMA mmap_size=268435456;
+    ''')
+    return conn
+
+
+def _get_conn():
+    """获取当前线程复用的查询连接，首次调用时打开并配置，结果行可按列名访问"""
+    conn = getattr(_LOCAL, "conn", None)
+    if conn is None:
+        conn = _configure(sqlite3.connect('fund_data.db'))
+        conn.row_factory = sqlite3.Row  # 这样可以按列名访问结果
+        _LOCAL.conn = conn
+    return conn
+
 
 def create_fund_database():
     """创建基金数据库和表结构"""
-    conn = sqlite3.connect('fund_data.db')
+    conn = _configure(sqlite3.connect('fund_data.db'))
     cursor = conn.cursor()
     
     # 创建基金信息表，使用中文字段名
@@ -40,6 +116,38 @@ def create_fund_database():
     )
     ''')
     
+    # 前缀搜索用的索引；LIKE 默认不区分大小写，索引需使用 NOCASE 排序规则才能被利用
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_name ON 基金数据(基金简称 COLLATE NOCASE)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_pinyin ON 基金数据(基金简拼 COLLATE NOCASE)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_code ON 基金数据(基金代码 COLLATE NOCASE)')
+    
+    # 子串搜索用的 FTS5 外部内容表，trigram 分词可以匹配中文名称中的任意片段
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = '基金_fts'")
+    fts_exists = cursor.fetchone() is not None
+    cursor.executescript('''
+    CREATE VIRTUAL TABLE IF NOT EXISTS 基金_fts USING fts5(
+        基金代码, 基金简称, 基金简拼,
+        content='基金数据', content_rowid='ID', tokenize='trigram'
+    );
+    CREATE TRIGGER IF NOT EXISTS 基金数据_ai AFTER INSERT ON 基金数据 BEGIN
+        INSERT INTO 基金_fts(rowid, 基金代码, 基金简称, 基金简拼)
+        VALUES (new.ID, new.基金代码, new.基金简称, new.基金简拼);
+    END;
+    CREATE TRIGGER IF NOT EXISTS 基金数据_ad AFTER DELETE ON 基金数据 BEGIN
+        INSERT INTO 基金_fts(基金_fts, rowid, 基金代码, 基金简称, 基金简拼)
+        VALUES ('delete', old.ID, old.基金代码, old.基金简称, old.基金简拼);
+    END;
+    CREATE TRIGGER IF NOT EXISTS 基金数据_au AFTER UPDATE ON 基金数据 BEGIN
+        INSERT INTO 基金_fts(基金_fts, rowid, 基金代码, 基金简称, 基金简拼)
+        VALUES ('delete', old.ID, old.基金代码, old.基金简称, old.基金简拼);
+        INSERT INTO 基金_fts(rowid, 基金代码, 基金简称, 基金简拼)
+        VALUES (new.ID, new.基金代码, new.基金简称, new.基金简拼);
+    END;
+    ''')
+    if not fts_exists:
+        # 新建的全文索引为空，先按基金数据表中已有的行建立一次，之后由触发器保持同步
+        cursor.execute("INSERT INTO 基金_fts(基金_fts) VALUES('rebuild')")
+    
     conn.commit()
     conn.close()
     print("基金数据库创建成功！")
@@ -47,7 +155,7 @@ def create_fund_database():
 
 def clean_percentage_value(value):
     """清理百分比数值，转换为小数"""
-    if not value or value == '' or value == 'None' or value is None:
+    if not value or value == 'None':
         return None
     # 移除百分号并转换为浮点数，然后除以100
     cleaned_value = value.replace('%', '').strip()
@@ -59,7 +167,7 @@ def clean_percentage_value(value):
 
 def clean_numeric_value(value):
     """清理普通数值"""
-    if not value or value == '' or value == 'None' or value is None:
+    if not value or value == 'None':
         return None
     try:
         # 如果是百分比，先移除百分号
@@ -71,128 +179,151 @@ def clean_numeric_value(value):
 
 
 def clean_empty_value(value):
-    if not value or value == '' or value == 'None' or value is None:
-        return None
-    else:
-        return value
+    return None if not value or value == 'None' else value
 
 
 def clean_int_to_boolean(value, default="否"):
     """清理整数值"""
-    if not value or value == '' or value == 'None' or value is None:
-        return default
-    try:
-        return "是"
-    except (ValueError, TypeError):
-        return default
+    return default if not value or value == 'None' else "是"
 
 
-def insert_fund_data(fund_data):
-    """插入基金数据"""
-    conn = sqlite3.connect('fund_data.db')
-    cursor = conn.cursor()
-    
-    try:
-        # 打印调试信息
-        print(f"正在插入基金数据: {fund_data.get('基金代码')} - {fund_data.get('基金简称')}")
-        
-        cursor.execute('''
-        INSERT OR REPLACE INTO 基金数据 (
-            基金代码, 基金简称, 基金简拼, 更新日期, 单位净值,
-            累计净值, 日增长率, 近1周收益率, 近1月收益率,
-            近3月收益率, 近6月收益率, 近1年收益率, 近2年收益率,
-            近3年收益率, 今年来收益率, 成立来收益率, 发行日期,
-            是否可购, 自定义2, 自定义3, 手续费, 折扣,
-            自定义5, 自定义6
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            fund_data.get('基金代码'),
-            fund_data.get('基金简称'),
-            clean_empty_value(fund_data.get('基金简拼')),
-            clean_empty_value(fund_data.get('更新日期')),
-            clean_empty_value(fund_data.get('单位净值', '').replace('%', '')),
-            clean_empty_value(fund_data.get('累计净值', '').replace('%', '')),
-            clean_empty_value(fund_data.get('日增长率')),
-            clean_empty_value(fund_data.get('近1周')),
-            clean_empty_value(fund_data.get('近1月')),
-            clean_empty_value(fund_data.get('近3月')),
-            clean_empty_value(fund_data.get('近6月')),
-            clean_empty_value(fund_data.get('近1年')),
-            clean_empty_value(fund_data.get('近2年')),
-            clean_empty_value(fund_data.get('近3年')),
-            clean_empty_value(fund_data.get('今年来')),
-            clean_empty_value(fund_data.get('成立来')),
-            clean_empty_value(fund_data.get('发行日期')),
-            clean_int_to_boolean(fund_data.get('是否可购')),
-            clean_empty_value(fund_data.get('自定义2')),
-            clean_empty_value(fund_data.get('自定义3')),
-            clean_empty_value(fund_data.get('手续费')),
-            clean_int_to_boolean(fund_data.get('折扣')),
-            clean_empty_value(fund_data.get('自定义5')),
-            clean_empty_value(fund_data.get('自定义6'))
-        ))
-        
-        conn.commit()
-        print(f"基金数据插入成功：{fund_data.get('基金代码')} - {fund_data.get('基金简称')}")
-        
-    except Exception as e:
-        print(f"插入数据时出错：{e}")
-        # 打印出错的具体字段值以便调试
-        print(f"问题数据: {fund_data}")
-        conn.rollback()
-    finally:
-        conn.close()
+def clean_net_value(value):
+    """清理净值，去掉数据源在末尾附带的百分号"""
+    if not value or value == 'None':
+        return None
+    return value.rstrip('%') or None
 
 
-def query_fund_data(fund_code=None, fund_name_keyword=None):
+# 插入字段及其清理函数，顺序与 _INSERT_SQL 中的列一致；None 表示原样写入
+_FIELDS = (
+    ('基金代码', None),
+    ('基金简称', None),
+    ('基金简拼', clean_empty_value),
+    ('更新日期', clean_empty_value),
+    ('单位净值', clean_net_value),
+    ('累计净值', clean_net_value),
+    ('日增长率', clean_empty_value),
+    ('近1周', clean_empty_value),
+    ('近1月', clean_empty_value),
+    ('近3月', clean_empty_value),
+    ('近6月', clean_empty_value),
+    ('近1年', clean_empty_value),
+    ('近2年', clean_empty_value),
+    ('近3年', clean_empty_value),
+    ('今年来', clean_empty_value),
+    ('成立来', clean_empty_value),
+    ('发行日期', clean_empty_value),
+    ('是否可购', clean_int_to_boolean),
+    ('自定义2', clean_empty_value),
+    ('自定义3', clean_empty_value),
+    ('手续费', clean_empty_value),
+    ('折扣', clean_int_to_boolean),
+    ('自定义5', clean_empty_value),
+    ('自定义6', clean_empty_value),
+)
+
+
+def _rows(path):
+    """逐行读取 JSONL 文件，生成插入语句所需的参数元组"""
+    with open(path, "r", encoding="utf-8") as f:
+        # 直接迭代文件对象逐行读取，不把整个文件读入内存
+        for i, line in enumerate(f, 1):
+            try:
+                fund_data = _loads(line)
+                row = tuple(
+                    clean(fund_data.get(key)) if clean else fund_data.get(key)
+                    for key, clean in _FIELDS
+                )
+            except (ValueError, TypeError, AttributeError):
+                # 单行数据有误时记录行号和原始内容并跳过，不影响其他行导入
+                log.warning("第 %d 行数据有误，已跳过。问题数据: %s", i, line.rstrip("\n"))
+                continue
+            log.debug("正在插入基金数据: %s - %s", fund_data.get('基金代码'), fund_data.get('基金简称'))
+            if i % LOG_EVERY == 0:
+                log.info("已导入 %d 条基金数据", i)
+            yield row
+
+
+def insert_fund_data(cursor, fund_rows):
+    """批量插入基金数据
+    Args:
+        cursor: 已打开连接上的游标，由调用方负责事务提交
+        fund_rows: 插入参数元组的可迭代对象，例如 _rows() 生成器
+    """
+    cursor.executemany(_INSERT_SQL, fund_rows)
+
+
+def query_fund_data(fund_code=None, fund_name_keyword=None, limit=100, offset=0):
     """查询基金数据
     Args:
         fund_code: 基金代码（精确查询）
         fund_name_keyword: 基金名称关键词（模糊查询）
+        limit: 最多返回的行数
+        offset: 跳过的行数，用于分页
+    Returns:
+        sqlite3.Row 列表，可按列名取值
     """
-    conn = sqlite3.connect('fund_data.db')
-    cursor = conn.cursor()
+    cursor = _get_conn().cursor()
     
     if fund_code:
         # 按基金代码精确查询
         cursor.execute('SELECT * FROM 基金数据 WHERE 基金代码 = ?', (fund_code,))
     elif fund_name_keyword:
         # 按基金名称模糊查询
-        cursor.execute('SELECT * FROM 基金数据 WHERE 基金简称 LIKE ? ORDER BY 基金代码', 
-                      (f'%{fund_name_keyword}%',))
+        cursor.execute('SELECT * FROM 基金数据 WHERE 基金简称 LIKE ? ORDER BY 基金代码 LIMIT ? OFFSET ?', 
+                      (f'%{fund_name_keyword}%', limit, offset))
     else:
-        # 查询所有数据
-        cursor.execute('SELECT * FROM 基金数据 ORDER BY 基金代码')
+        # 分页查询所有数据，基金代码上的唯一索引已有序，排序不需要额外开销
+        cursor.execute('SELECT * FROM 基金数据 ORDER BY 基金代码 LIMIT ? OFFSET ?', (limit, offset))
     
     results = cursor.fetchall()
-    conn.close()
     
-    # 获取列名
-    column_names = [description[0] for description in cursor.description]
-    
-    return column_names, results
+    return results
 
 
-def fuzzy_search_funds(keyword):
-    """基金名称模糊搜索，返回简化的结果"""
-    conn = sqlite3.connect('fund_data.db')
-    cursor = conn.cursor()
+def fuzzy_search_funds(keyword, prefix=False, limit=100, offset=0):
+    """基金名称模糊搜索，返回简化的结果
+    Args:
+        keyword: 搜索关键词，匹配基金简称、基金简拼或基金代码
+        prefix: 为 True 时只做前缀匹配，可走索引范围扫描
+        limit: 最多返回的行数
+        offset: 跳过的行数，用于分页
+    """
+    if not keyword:
+        return []
+    # 单个字符几乎匹配所有基金，只做前缀匹配以便走索引
+    if len(keyword) < 2:
+        prefix = True
     
-    # 使用LIKE进行模糊匹配
-    cursor.execute('''
-        SELECT 基金代码, 基金简称, 基金简拼, 单位净值, 日增长率
-        FROM 基金数据 
-        WHERE 基金简称 LIKE ? OR 基金简拼 LIKE ? OR 基金代码 LIKE ?
-        ORDER BY 基金代码
-    ''', (f'%{keyword}%', f'%{keyword}%', f'%{keyword}%'))
+    cursor = _get_conn().cursor()
+    
+    if not prefix and len(keyword) >= 3:
+        # 子串匹配走 FTS5 trigram 索引，关键词按短语引用以免被解析为查询语法
+        cursor.execute('''
+            SELECT d.基金代码, d.基金简称, d.基金简拼, d.单位净值, d.日增长率
+            FROM 基金_fts JOIN 基金数据 d ON d.ID = 基金_fts.rowid
+            WHERE 基金_fts MATCH ?
+            ORDER BY d.基金代码
+            LIMIT ? OFFSET ?
+        ''', ('"' + keyword.replace('"', '""') + '"', limit, offset))
+    else:
+        # 使用LIKE进行模糊匹配；前缀匹配时模式不以%开头，SQLite 会改写为索引范围查询。
+        # trigram 无法匹配少于3个字符的关键词，此时同样回退到LIKE
+        pattern = f'{keyword}%' if prefix else f'%{keyword}%'
+        cursor.execute('''
+            SELECT 基金代码, 基金简称, 基金简拼, 单位净值, 日增长率
+            FROM 基金数据 
+            WHERE 基金简称 LIKE ? OR 基金简拼 LIKE ? OR 基金代码 LIKE ?
+            ORDER BY 基金代码
+            LIMIT ? OFFSET ?
+        ''', (pattern, pattern, pattern, limit, offset))
     
     results = cursor.fetchall()
-    conn.close()
     
     return results
 
 
-def display_fund_data(column_names, data):
+def display_fund_data(data):
     """显示基金数据"""
     if not data:
         print("没有找到数据")
@@ -201,44 +332,54 @@ def display_fund_data(column_names, data):
     print("\n基金数据：")
     print("-" * 100)
     for row in data:
-        for i, value in enumerate(row):
+        # 结果行为 sqlite3.Row，按列名取值
+        for column in row.keys():
+            value = row[column]
             # 格式化显示百分比数据
-            if column_names[i] in ['日增长率', '近1周收益率', '近1月收益率', 
-                                  '近3月收益率', '近6月收益率', '近1年收益率',
-                                  '近2年收益率', '近3年收益率', '今年来收益率',
-                                  '成立来收益率', '自定义3', '手续费', '自定义5']:
+            if column in _PCT_COLS:
                 if value is not None:
-                    print(f"{column_names[i]}: {value}")
+                    print(f"{column}: {value}")
                 else:
-                    print(f"{column_names[i]}: None")
+                    print(f"{column}: None")
             else:
-                print(f"{column_names[i]}: {value}")
+                print(f"{column}: {value}")
         print("-" * 100)
 
 
-def display_search_results(results):
-    """显示模糊搜索结果"""
+def display_search_results(results, offset=0, more=False):
+    """显示模糊搜索结果
+    Args:
+        results: 当前页的搜索结果
+        offset: 当前页第一条结果的序号偏移
+        more: 当前页之后是否还有更多结果
+    """
     if not results:
-        print("没有找到匹配的基金")
+        print("没有找到匹配的基金" if offset == 0 else "没有更多匹配的基金")
         return
     
-    print(f"\n找到 {len(results)} 个匹配的基金：")
+    if offset == 0 and not more:
+        print(f"\n找到 {len(results)} 个匹配的基金：")
+    else:
+        print(f"\n匹配的基金（第 {offset + 1}-{offset + len(results)} 个）：")
     print("=" * 80)
     print(f"{'基金代码':<10} {'基金简称':<30} {'单位净值':<10} {'日增长率':<10}")
     print("-" * 80)
     
     for fund in results:
-        fund_code, fund_name, fund_abbr, unit_net_value, daily_growth_rate = fund
+        fund_code = fund['基金代码']
+        fund_name = fund['基金简称']
         
-        # 格式化日增长率
-        growth_display = f"{daily_growth_rate:.2%}" if daily_growth_rate is not None else "N/A"
-        # 格式化单位净值
-        net_value_display = f"{unit_net_value:.4f}" if unit_net_value is not None else "N/A"
+        # 日增长率和单位净值按文本存储（如 "-3.56%"、"2.7056"），原样显示
+        growth_display = fund['日增长率'] if fund['日增长率'] is not None else "N/A"
+        net_value_display = fund['单位净值'] if fund['单位净值'] is not None else "N/A"
         
         # 如果基金名称太长，截断显示
         display_name = fund_name[:28] + "..." if len(fund_name) > 30 else fund_name
         
         print(f"{fund_code:<10} {display_name:<30} {net_value_display:<10} {growth_display:<10}")
+    
+    if more:
+        print("还有更多匹配的基金")
 
 
 def search_funds_interactive():
@@ -256,35 +397,53 @@ def search_funds_interactive():
         if choice == '1':
             fund_code = input("请输入基金代码: ").strip()
             if fund_code:
-                column_names, data = query_fund_data(fund_code=fund_code)
-                display_fund_data(column_names, data)
+                data = query_fund_data(fund_code=fund_code)
+                display_fund_data(data)
             else:
                 print("基金代码不能为空")
                 
         elif choice == '2':
             keyword = input("请输入基金名称关键词: ").strip()
             if keyword:
-                # 显示简化的搜索结果
-                results = fuzzy_search_funds(keyword)
-                display_search_results(results)
+                # 分页显示简化的搜索结果，每页 PAGE_SIZE 条；多取一条用于判断是否还有下一页
+                offset = 0
+                while True:
+                    results = fuzzy_search_funds(keyword, limit=PAGE_SIZE + 1, offset=offset)
+                    more = len(results) > PAGE_SIZE
+                    results = results[:PAGE_SIZE]
+                    display_search_results(results, offset=offset, more=more)
+                    if not more:
+                        break
+                    if input("按回车显示下一页，输入 q 结束: ").strip().lower() == 'q':
+                        break
+                    offset += PAGE_SIZE
                 
                 # 询问是否查看详细信息
-                if results and len(results) == 1:
+                if offset == 0 and len(results) == 1:
                     view_detail = input("是否查看详细信息? (y/n): ").strip().lower()
                     if view_detail == 'y':
-                        column_names, data = query_fund_data(fund_code=results[0][0])
-                        display_fund_data(column_names, data)
-                elif results and len(results) > 1:
+                        data = query_fund_data(fund_code=results[0]['基金代码'])
+                        display_fund_data(data)
+                elif results:
                     fund_code = input("请输入要查看详细信息的基金代码: ").strip()
                     if fund_code:
-                        column_names, data = query_fund_data(fund_code=fund_code)
-                        display_fund_data(column_names, data)
+                        data = query_fund_data(fund_code=fund_code)
+                        display_fund_data(data)
             else:
                 print("关键词不能为空")
                 
         elif choice == '3':
-            column_names, data = query_fund_data()
-            display_fund_data(column_names, data)
+            # 分页显示，每页 PAGE_SIZE 条；多取一条用于判断是否还有下一页
+            offset = 0
+            while True:
+                data = query_fund_data(limit=PAGE_SIZE + 1, offset=offset)
+                more = len(data) > PAGE_SIZE
+                display_fund_data(data[:PAGE_SIZE])
+                if not more:
+                    break
+                if input("按回车显示下一页，输入 q 返回: ").strip().lower() == 'q':
+                    break
+                offset += PAGE_SIZE
             
         elif choice == '4':
             print("退出搜索系统")
@@ -299,15 +458,31 @@ def main():
     create_fund_database()
     
 
-    with open("fund_rank.jsonl", "r", encoding="utf-8") as f:
+    # 整个文件在同一个事务中导入，避免每行提交都触发一次磁盘同步
+    conn = _configure(sqlite3.connect('fund_data.db'))
+    try:
+        cursor = conn.cursor()
         # 插入示例数据
-        for line in f.readlines():
-            fund_data = json.loads(line)
-            insert_fund_data(fund_data)
+        insert_fund_data(cursor, _rows("fund_rank.jsonl"))
+        conn.commit()
+    except Exception:
+        log.exception("插入数据时出错，已回滚本次导入")
+        conn.rollback()
+    else:
+        log.info("基金数据导入完成，共 %d 条", cursor.rowcount)
+        # 导入完成后重新收集基金数据表及其索引的统计信息，供查询规划器使用；
+        # 这条连接只执行过 INSERT，PRAGMA optimize 的启发式规则会跳过该表
+        try:
+            conn.execute("ANALYZE 基金数据")
+        except sqlite3.Error as e:
+            log.warning("更新统计信息出错：%s", e)
+    finally:
+        conn.close()
     
     # 启动交互式搜索
     search_funds_interactive()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    main()
@@ -1,14 +1,39 @@
 from fastmcp import FastMCP
+import functools
 import sqlite3
 import os
 import json
+import re
+import threading
 from pathlib import Path
 
 mcp = FastMCP("operateSQLite")
 
+# 语句开头的空白和注释（-- 行注释、/* */ 块注释），判断语句类型前先去掉
+_LEADING_COMMENTS_RE = re.compile(r"^(?:\s+|--[^\n]*|/\*.*?\*/)*", re.DOTALL)
 
+# 可以合并为一次 executescript 执行的DDL语句
+_DDL_RE = re.compile(r"(CREATE|DROP|ALTER)\b", re.IGNORECASE)
+
+# 每个线程持有一个长连接，保留连接上的页缓存
+_LOCAL = threading.local()
+
+
+def _configure(conn):
+    """为新打开的连接设置 WAL 日志及缓存相关的 PRAGMA"""
+    conn.executescript('''
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-64000;
+    PRAGMA mmap_size=268435456;
+    ''')
+    return conn
+
+
+@functools.lru_cache(maxsize=1)
 def get_db_config():
-    """从环境变量获取SQLite数据库配置信息
+    """从环境变量获取SQLite数据库配置信息，结果在进程内缓存，只解析一次
 
     返回:
         dict: 包含数据库连接所需的配置信息
@@ -28,53 +53,88 @@ def get_db_config():
         "db_path": db_path,
     }
     
-    print(f"SQLite数据库路径: {db_path}")
     return config
 
 
-def execute_sql_internal(query: str) -> list:
+def _get_conn():
+    """获取当前线程的数据库连接，首次调用时打开并配置
+
+    返回:
+        sqlite3.Connection: 自动提交模式的连接，结果行可按列名访问
+    """
+    conn = getattr(_LOCAL, "conn", None)
+    if conn is None:
+        config = get_db_config()
+        db_path = config["db_path"]
+
+        # 确保数据库文件所在目录存在
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir, exist_ok=True)
+
+        conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        _configure(conn)
+        conn.row_factory = sqlite3.Row  # 这样可以按列名访问结果
+
+        # 长连接按SQLite的建议在打开时执行一次 optimize；失败（如数据库繁忙）不影响使用
+        try:
+            conn.execute("PRAGMA optimize=0x10002")
+        except sqlite3.Error as e:
+            print(f"执行 PRAGMA optimize 出错: {e}")
+
+        _LOCAL.conn = conn
+    return conn
+
+
+def execute_sql_internal(query: str, params: tuple = ()) -> list:
     """执行SQL查询语句的内部实现（普通函数）
 
     参数:
         query (str): 要执行的SQL语句，支持多条语句以分号分隔
+        params (tuple): 绑定到语句占位符的参数，仅适用于单条语句
 
     返回:
         list: 包含查询结果的列表
     """
-    config = get_db_config()
-    db_path = config["db_path"]
-    
-    # 确保数据库文件所在目录存在
-    db_dir = os.path.dirname(db_path)
-    if db_dir and not os.path.exists(db_dir):
-        os.makedirs(db_dir, exist_ok=True)
-    
     try:
-        with sqlite3.connect(db_path) as conn:
-            conn.row_factory = sqlite3.Row  # 这样可以按列名访问结果
-            cursor = conn.cursor()
-            
-            statements = [stmt.strip() for stmt in query.split(";") if stmt.strip()]
-            results = []
+        conn = _get_conn()
+        cursor = conn.cursor()
+
+        # 去掉只有注释的片段（如末尾分号后的注释）
+        statements = [
+            stmt.strip() for stmt in query.split(";")
+            if _LEADING_COMMENTS_RE.sub("", stmt).strip()
+        ]
+        results = []
 
+        if not params and len(statements) > 1 and not conn.in_transaction and all(
+            _DDL_RE.match(_LEADING_COMMENTS_RE.sub("", stmt)) for stmt in statements
+        ):
+            # 多条DDL语句交给 executescript 一次解析执行，并放在同一个事务中提交；
+            # 任一语句出错则整批回滚。DML等语句逐条执行，以便返回结果集和影响行数
+            try:
+                conn.executescript(f"BEGIN;\n{query}\n;COMMIT;")
+                results.append(f"批量执行成功，共 {len(statements)} 条语句")
+            except Exception as batch_error:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                results.append(f"批量执行语句出错，已全部回滚: {str(batch_error)}")
+        else:
             for statement in statements:
                 try:
-                    cursor.execute(statement)
-                    
+                    cursor.execute(statement, params)
+                
                     # 检查语句是否返回了结果集 (SELECT, PRAGMA等)
                     if cursor.description:
                         columns = [desc[0] for desc in cursor.description]
-                        rows = cursor.fetchall()
-                        
-                        # 将每一行的数据转换为字符串，特殊处理None值
-                        formatted_rows = []
-                        for row in rows:
-                            formatted_row = [
-                                "NULL" if value is None else str(value)
-                                for value in row
-                            ]
-                            formatted_rows.append(",".join(formatted_row))
-                        
+                    
+                        # 直接迭代游标逐行取数，将每一行的数据转换为字符串，特殊处理None值；
+                        # 不再先 fetchall 出完整结果集，避免原始行和格式化结果同时驻留内存
+                        formatted_rows = [
+                            ",".join("NULL" if value is None else str(value) for value in row)
+                            for row in cursor
+                        ]
+                    
                         '''
                         if formatted_rows:
                             results.append("\n".join([",".join(columns)] + formatted_rows))
@@ -83,18 +143,27 @@ def execute_sql_internal(query: str) -> list:
                         '''
                         tmp = {"columns": columns, "data":formatted_rows}
                         results.append(json.dumps(tmp, ensure_ascii=False))
-                    
+                
                     # 如果语句没有返回结果集 (INSERT, UPDATE, DELETE, CREATE等)
+                    # 连接处于自动提交模式，语句执行后即已提交；显式开启的事务在调用结束时提交
                     else:
-                        conn.commit()  # 提交事务
                         results.append(f"查询执行成功。影响行数: {cursor.rowcount}")
-                        
+                    
                 except Exception as stmt_error:
                     # 单条语句执行出错时，记录错误并继续执行
                     results.append(f"执行语句 '{statement}' 出错: {str(stmt_error)}")
-            
-            return ["\n---\n".join(results)]
-            
+
+        # 事务不跨调用保留：语句中显式开启但未结束的事务在本次调用结束时提交，
+        # 避免线程复用的连接一直持有写锁
+        if conn.in_transaction:
+            try:
+                conn.commit()
+            except sqlite3.Error as commit_error:
+                conn.rollback()
+                results.append(f"提交事务出错，已回滚: {str(commit_error)}")
+
+        return ["\n---\n".join(results)]
+        
     except Exception as e:
         print(f"执行SQL '{query}' 时出错: {e}")
         return [f"执行查询时出错: {str(e)}"]
@@ -111,6 +180,8 @@ def execute_sql(query: str) -> list:
         list: 包含查询结果的TextContent列表
         - 对于SELECT查询：返回CSV格式的结果，包含列名和数据
         - 对于其他查询：返回执行状态和影响行数
+        - 多条DDL语句（CREATE/DROP/ALTER）：在同一事务中批量执行，出错时整批回滚，返回执行的语句数
+        - 语句中显式开启的事务在调用结束时提交，不会跨调用保留
         - 多条语句的结果以"---"分隔
 
     异常:
@@ -131,12 +202,11 @@ def get_table_name(text: str = "") -> list:
         - 返回匹配的表名信息
         - 结果以CSV格式返回，包含列名和数据
     """
-    if text:
-        query = f"SELECT name as table_name FROM sqlite_master WHERE type='table' AND name LIKE '%{text}%';"
-    else:
-        query = "SELECT name as table_name FROM sqlite_master WHERE type='table';"
-    
-    return execute_sql_internal(query)
+    # 固定的SQL文本配合参数绑定，关键词为空时条件短路，语句可以复用缓存的预编译结果；
+    # 关键词中的 % 和 _ 被转义，使其按字面匹配
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    query = "SELECT name as table_name FROM sqlite_master WHERE type='table' AND (? = '' OR name LIKE ? ESCAPE '\\');"
+    return execute_sql_internal(query, (text, f"%{escaped}%"))
 
 
 @mcp.tool()
@@ -151,7 +221,11 @@ def get_table_desc(table_name: str) -> list:
         - 返回表的字段名、数据类型、是否可为空等信息
         - 结果以CSV格式返回，包含列名和数据
     """
-    query = f"PRAGMA table_info({table_name});"
+    # PRAGMA 不支持参数绑定，只允许由字母、数字、下划线和汉字组成的表名
+    if not re.fullmatch(r"[A-Za-z0-9_\u4e00-\u9fff]+", table_name):
+        return [f"无效的表名: {table_name}"]
+
+    query = f'PRAGMA table_info("{table_name}");'
     return execute_sql_internal(query)
 
 
@@ -175,14 +249,21 @@ def backup_database(backup_path: str = None) -> list:
         backup_path = f"{base_name}_backup_{timestamp}.db"
     
     try:
-        import shutil
-        shutil.copy2(db_path, backup_path)
+        # 使用SQLite在线备份接口，每批复制1024页，期间不会长时间持有锁，
+        # 也不会像直接复制文件那样拷到未合并的WAL内容
+        src = _get_conn()
+        dst = sqlite3.connect(backup_path)
+        try:
+            src.backup(dst, pages=1024)
+        finally:
+            dst.close()
         return [f"数据库备份成功: {backup_path}"]
     except Exception as e:
         return [f"备份失败: {str(e)}"]
 
 
 if __name__ == "__main__":
+    print(f"SQLite数据库路径: {get_db_config()['db_path']}")
 
     # 运行MCP服务器，端口在run方法中指定
     mcp.run(transport="sse", host="0.0.0.0", port=9000)
\ No newline at end of file